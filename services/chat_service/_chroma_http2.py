@@ -0,0 +1,62 @@
+"""
+Pooled HTTP/2 sessions for chromadb (1.0.x) clients
+Shared by the GPU chatbots; the replacement sessions keep the client's headers and TLS verification
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _ssl_verify(server):
+    """The TLS verification chromadb configured its own session with: settings.chroma_server_ssl_verify
+    (a bool or CA bundle path) when set, else httpx's default of verifying"""
+    verify = getattr(getattr(server, '_settings', None), 'chroma_server_ssl_verify', None)
+    return True if verify is None else verify
+
+
+def use_http2_session(client, max_connections: int = 32):
+    """Swap a chromadb (1.0.x) HttpClient's httpx session for a pooled HTTP/2 one, so concurrent
+    queries multiplex over one TLS connection. Needs the h2 package (pip install httpx[http2])."""
+    server = getattr(client, '_server', None)
+    session = getattr(server, '_session', None)
+    if session is None:
+        logger.warning("[LAMBDA GPU] ChromaDB client exposes no HTTP session; HTTP/2 not enabled")
+        return
+    try:
+        import httpx
+        server._session = httpx.Client(
+            http2=True,
+            timeout=None,
+            headers=session.headers,
+            verify=_ssl_verify(server),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 2)
+        )
+        session.close()
+        logger.info("[LAMBDA GPU] ChromaDB client using pooled HTTP/2 session")
+    except ImportError as e:
+        logger.warning(f"[LAMBDA GPU] HTTP/2 not enabled for ChromaDB: {e}")
+
+
+async def use_http2_async_session(client, max_connections: int):
+    """AsyncHttpClient counterpart of use_http2_session: chromadb keeps one httpx.AsyncClient per
+    event loop, so the current loop's entry is replaced with an HTTP/2 one sized for the fan-out."""
+    server = getattr(client, '_server', None)
+    if not hasattr(server, '_get_client') or not hasattr(server, '_clients'):
+        logger.warning("[LAMBDA GPU] Async ChromaDB client exposes no HTTP session; HTTP/2 not enabled")
+        return
+    try:
+        import httpx
+        session = server._get_client()
+        server._clients[asyncio.get_running_loop().__hash__()] = httpx.AsyncClient(
+            http2=True,
+            timeout=None,
+            headers=session.headers,
+            verify=_ssl_verify(server),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        await session.aclose()
+        logger.info("[LAMBDA GPU] Async ChromaDB client using pooled HTTP/2 session")
+    except ImportError as e:
+        logger.warning(f"[LAMBDA GPU] HTTP/2 not enabled for async ChromaDB: {e}")
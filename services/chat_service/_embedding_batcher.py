@@ -0,0 +1,62 @@
+"""
+Micro-batching of concurrent embedding requests
+Shared by the GPU chatbots: single-text encodes arriving together run as one forward pass
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text encode requests into one batched forward pass
+    
+    Callers submit a text and block on the returned Future; a background thread
+    waits up to max_wait_ms for more requests (or until max_batch_size is reached),
+    encodes them together and fans the rows back out.
+    """
+    
+    def __init__(self, encode_fn, max_batch_size: int, max_wait_ms: float = 5.0):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: List[Tuple[str, Future]] = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, text: str) -> Future:
+        """Queue a text for the next micro-batch"""
+        future = Future()
+        with self._cond:
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                
+                # Give concurrent callers a short window to join this batch
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            
+            # Smart batching: similar lengths together keep padding to a minimum
+            batch.sort(key=lambda item: len(item[0]))
+            try:
+                embeddings = self._encode_fn([text for text, _ in batch])
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
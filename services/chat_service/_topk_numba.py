@@ -0,0 +1,84 @@
+"""
+Top-k selection over similarity / relevance score arrays
+Numba-compiled bounded min-heap when numba is installed, a stable numpy argsort otherwise
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _worse(value_a, index_a, value_b, index_b):
+        """Heap order: lower score first, and among equal scores the later index first"""
+        return value_a < value_b or (value_a == value_b and index_a > index_b)
+
+    @njit(cache=True)
+    def _topk_heap(scores, k):
+        """Single pass over scores keeping the k largest in a min-heap (root = worst kept)"""
+        heap_vals = np.empty(k, dtype=scores.dtype)
+        heap_idx = np.empty(k, dtype=np.int64)
+        size = 0
+        for i in range(scores.shape[0]):
+            value = scores[i]
+            if size < k:
+                # Sift up
+                j = size
+                size += 1
+                while j > 0:
+                    parent = (j - 1) // 2
+                    if not _worse(value, i, heap_vals[parent], heap_idx[parent]):
+                        break
+                    heap_vals[j] = heap_vals[parent]
+                    heap_idx[j] = heap_idx[parent]
+                    j = parent
+                heap_vals[j] = value
+                heap_idx[j] = i
+            elif value > heap_vals[0]:
+                # Replace the worst kept score and sift down; ties keep the earlier index
+                j = 0
+                while True:
+                    child = 2 * j + 1
+                    if child >= k:
+                        break
+                    if child + 1 < k and _worse(heap_vals[child + 1], heap_idx[child + 1], heap_vals[child], heap_idx[child]):
+                        child += 1
+                    if not _worse(heap_vals[child], heap_idx[child], value, i):
+                        break
+                    heap_vals[j] = heap_vals[child]
+                    heap_idx[j] = heap_idx[child]
+                    j = child
+                heap_vals[j] = value
+                heap_idx[j] = i
+        return heap_idx, heap_vals
+
+
+def topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and values of the k largest scores, best first (ties in index order)"""
+    scores = np.ascontiguousarray(scores)
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), scores[:0]
+
+    if NUMBA_AVAILABLE:
+        indices, values = _topk_heap(scores, k)
+    else:
+        # Stable, so a tie at the k-th boundary keeps the earlier index like the heap does
+        indices = np.argsort(-scores, kind='stable')[:k]
+        values = scores[indices]
+
+    order = np.lexsort((indices, -values))
+    return indices[order], values[order]
+
+
+def warm_up():
+    """Compile (or load the cached build of) the numba kernel before the first request"""
+    if NUMBA_AVAILABLE:
+        topk(np.zeros(4, dtype=np.float32), 2)
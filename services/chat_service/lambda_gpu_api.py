@@ -7,6 +7,7 @@ import os
 import sys
 import time
 import asyncio
+import json
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 import logging
@@ -16,7 +17,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
@@ -101,6 +102,9 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     global chatbot
     if chatbot:
+        # Persist embedding and semantic answer caches so the next start is warm
+        chatbot.save_cache()
+        
         # Clear GPU cache
         clear_gpu_cache()
         logger.info("[LAMBDA GPU API] Shutdown complete")
@@ -115,6 +119,7 @@ async def root():
         "gpu_accelerated": True,
         "endpoints": {
             "chat": "/chat",
+            "chat-stream": "/chat/stream",
             "health": "/health",
             "gpu-info": "/gpu-info",
             "docs": "/docs"
@@ -240,8 +245,9 @@ async def chat(request: ChatRequest):
             logger.info("[LAMBDA GPU API] Cache cleared by request")
         
         # Process the question
+        # Concurrent requests meet in the embedding micro-batcher instead of queueing on the event loop
         start_time = time.time()
-        response = chatbot.chat(request.question)
+        response = await chatbot.achat(request.question)
         processing_time = time.time() - start_time
         
         logger.info(f"[LAMBDA GPU API] Question processed in {processing_time:.2f}s")
@@ -258,6 +264,21 @@ async def chat(request: ChatRequest):
         logger.error(f"[LAMBDA GPU API] Chat failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat endpoint: newline-delimited JSON events (sources, token..., done)"""
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    def event_stream():
+        for event in chatbot.chat_stream(request.question):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.post("/clear-cache")
 async def clear_cache(background_tasks: BackgroundTasks):
     """Clear GPU cache and embeddings cache"""
@@ -316,7 +337,7 @@ async def test_endpoint():
         
         # Simple test question
         test_question = "What is Northeastern University?"
-        response = chatbot.chat(test_question)
+        response = await chatbot.achat(test_question)
         
         return {
             "status": "success",
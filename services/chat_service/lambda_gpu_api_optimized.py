@@ -16,8 +16,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, field_serializer
 import uvicorn
 
 # Import our GPU-optimized chatbot
@@ -32,6 +32,9 @@ from services.chat_service.lambda_gpu_chatbot_optimized import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Every question in a /chat/batch request gets its own LLM call, all in flight at once
+MAX_CHAT_BATCH_SIZE = int(os.getenv('MAX_CHAT_BATCH_SIZE', '16'))
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Northeastern University Chatbot - Lambda GPU",
@@ -56,12 +59,37 @@ class ChatRequest(BaseModel):
     n_results: Optional[int] = 10
     clear_cache: Optional[bool] = False
 
+class ChatBatchRequest(BaseModel):
+    questions: List[str]
+
 class ChatResponseModel(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
     confidence: str
     timing: Dict[str, float]
     gpu_info: Dict[str, Any]
+    
+    # The chatbot keeps full-precision floats; rounding happens once, at egress
+    @field_serializer('sources')
+    def _round_similarity(self, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {**source, 'similarity': round(float(source['similarity']), 3)} if 'similarity' in source else source
+            for source in sources
+        ]
+    
+    @field_serializer('timing')
+    def _round_timing(self, timing: Dict[str, float]) -> Dict[str, float]:
+        return {key: round(value, 2) for key, value in timing.items()}
+    
+    @classmethod
+    def from_response(cls, response: ChatResponse) -> "ChatResponseModel":
+        return cls(
+            answer=response.answer,
+            sources=response.sources,
+            confidence=response.confidence,
+            timing=response.timing,
+            gpu_info=response.gpu_info
+        )
 
 class HealthResponse(BaseModel):
     status: str
@@ -101,6 +129,11 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     global chatbot
     if chatbot:
+        # Persist embedding caches so the next start is warm
+        chatbot.embedding_manager.save_cache()
+        if chatbot.answer_cache is not None:
+            chatbot.answer_cache.save()
+        
         # Clear GPU cache
         clear_gpu_cache()
         logger.info("[LAMBDA GPU API] Shutdown complete")
@@ -115,6 +148,8 @@ async def root():
         "gpu_accelerated": True,
         "endpoints": {
             "chat": "/chat",
+            "chat-batch": "/chat/batch",
+            "chat-stream": "/chat/stream",
             "health": "/health",
             "gpu-info": "/gpu-info",
             "docs": "/docs"
@@ -223,24 +258,61 @@ async def chat(request: ChatRequest):
             logger.info("[LAMBDA GPU API] Cache cleared by request")
         
         # Process the question
+        # Retrieval runs off the event loop and the LLM call is awaited, so requests overlap
         start_time = time.time()
-        response = chatbot.chat(request.question)
+        response = await chatbot.achat(request.question)
         processing_time = time.time() - start_time
         
         logger.info(f"[LAMBDA GPU API] Question processed in {processing_time:.2f}s")
         
-        return ChatResponseModel(
-            answer=response.answer,
-            sources=response.sources,
-            confidence=response.confidence,
-            timing=response.timing,
-            gpu_info=response.gpu_info
-        )
+        return ChatResponseModel.from_response(response)
         
     except Exception as e:
         logger.error(f"[LAMBDA GPU API] Chat failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/batch", response_model=List[ChatResponseModel])
+async def chat_batch(request: ChatBatchRequest):
+    """Answer several questions in one call (shared embedding pass, concurrent LLM calls)"""
+    try:
+        if not chatbot:
+            raise HTTPException(status_code=503, detail="Chatbot not initialized")
+        
+        questions = [question for question in request.questions if question.strip()]
+        if not questions:
+            raise HTTPException(status_code=400, detail="Questions cannot be empty")
+        if len(questions) > MAX_CHAT_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_CHAT_BATCH_SIZE} questions per batch")
+        
+        start_time = time.time()
+        responses = await chatbot.chat_batch(questions)
+        processing_time = time.time() - start_time
+        
+        logger.info(f"[LAMBDA GPU API] Batch of {len(questions)} questions processed in {processing_time:.2f}s")
+        
+        return [ChatResponseModel.from_response(response) for response in responses]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[LAMBDA GPU API] Batch chat failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat endpoint: newline-delimited JSON responses (answer deltas, then the final response)"""
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    async def event_stream():
+        async for response in chatbot.chat_stream(request.question):
+            yield ChatResponseModel.from_response(response).model_dump_json() + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.post("/clear-cache")
 async def clear_cache(background_tasks: BackgroundTasks):
     """Clear GPU cache and embeddings cache"""
@@ -280,10 +352,7 @@ async def get_performance_metrics():
                 "query_cache_size": len(chatbot.embedding_manager.embeddings_cache),
                 "document_cache_size": len(chatbot.embedding_manager.document_embeddings)
             },
-            "collections": {
-                "total": len(chatbot.chroma_service.get_batch_collections()),
-                "cached": len(chatbot.chroma_service.collections_cache)
-            }
+            "collection": chatbot.chroma_service.get_collection_info()
         }
         
     except Exception as e:
@@ -299,7 +368,7 @@ async def test_endpoint():
         
         # Simple test question
         test_question = "What is Northeastern University?"
-        response = chatbot.chat(test_question)
+        response = await chatbot.achat(test_question)
         
         return {
             "status": "success",
@@ -10,21 +10,29 @@ import torch
 import numpy as np
 import hashlib
 import pickle
+import json
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
+from functools import cached_property
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 import asyncio
 
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -80,7 +88,14 @@ class LambdaGPUEmbeddingManager:
         try:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'rb') as f:
-                    cache_data = pickle.load(f)
+                    header = pickle.load(f)
+                    if isinstance(header, dict):
+                        cache_data = header  # old single-pickle format
+                    else:
+                        # [payload length, buffer lengths...] then the payload and raw array buffers
+                        payload = f.read(header[0])
+                        buffers = [f.read(size) for size in header[1:]]
+                        cache_data = pickle.loads(payload, buffers=buffers)
                     self.embeddings_cache = cache_data.get('query_cache', {})
                     self.document_embeddings = cache_data.get('document_embeddings', {})
                 logger.info(f"[LAMBDA GPU] Loaded cache: {len(self.embeddings_cache)} queries, {len(self.document_embeddings)} documents")
@@ -96,8 +111,15 @@ class LambdaGPUEmbeddingManager:
                 'query_cache': self.embeddings_cache,
                 'document_embeddings': self.document_embeddings
             }
+            # Protocol 5 hands each ndarray's memory out-of-band, so it is written verbatim
+            buffers = []
+            payload = pickle.dumps(cache_data, protocol=5, buffer_callback=buffers.append)
+            raw = [buffer.raw() for buffer in buffers]
             with open(self.cache_file, 'wb') as f:
-                pickle.dump(cache_data, f)
+                pickle.dump([len(payload)] + [view.nbytes for view in raw], f, protocol=5)
+                f.write(payload)
+                for view in raw:
+                    f.write(view)
             logger.info(f"[LAMBDA GPU] Saved cache: {len(self.embeddings_cache)} queries, {len(self.document_embeddings)} documents")
         except Exception as e:
             logger.error(f"[LAMBDA GPU] Error saving cache: {e}")
@@ -121,7 +143,9 @@ class LambdaGPUEmbeddingManager:
         return self.model
     
     def get_document_hash(self, content: str) -> str:
-        """Generate hash for document content"""
+        """Generate hash for document content (xxh3-128 when available, MD5 otherwise)"""
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_128_hexdigest(content)
         return hashlib.md5(content.encode()).hexdigest()
     
     def get_query_embedding(self, content: str) -> np.ndarray:
@@ -130,16 +154,18 @@ class LambdaGPUEmbeddingManager:
         
         if doc_hash in self.embeddings_cache:
             return self.embeddings_cache[doc_hash]
+        if XXHASH_AVAILABLE:
+            # Entries cached before the switch from MD5 are still keyed by the old digest
+            legacy = self.embeddings_cache.pop(hashlib.md5(content.encode()).hexdigest(), None)
+            if legacy is not None:
+                self.embeddings_cache[doc_hash] = legacy
+                return legacy
         
         model = self.get_embedding_model()
         
-        # GPU-optimized embedding generation
-        with torch.cuda.amp.autocast() if self.device == "cuda" else torch.no_grad():
-            embedding = model.encode([content], convert_to_tensor=True, show_progress_bar=False)
-            if self.device == "cuda":
-                embedding = embedding.cpu().numpy()[0]
-            else:
-                embedding = embedding.numpy()[0]
+        # FP16 weights on GPU need no autocast; the caller's inference_mode covers grad tracking
+        embedding = model.encode([content], convert_to_tensor=True, normalize_embeddings=True, show_progress_bar=False)
+        embedding = embedding.cpu().numpy()[0]
         
         self.embeddings_cache[doc_hash] = embedding
         return embedding
@@ -151,20 +177,16 @@ class LambdaGPUEmbeddingManager:
         
         model = self.get_embedding_model()
         
-        # GPU-optimized embedding generation
-        with torch.cuda.amp.autocast() if self.device == "cuda" else torch.no_grad():
-            embedding = model.encode([content], convert_to_tensor=True, show_progress_bar=False)
-            if self.device == "cuda":
-                embedding = embedding.cpu().numpy()[0]
-            else:
-                embedding = embedding.numpy()[0]
+        # FP16 weights on GPU need no autocast; the caller's inference_mode covers grad tracking
+        embedding = model.encode([content], convert_to_tensor=True, normalize_embeddings=True, show_progress_bar=False)
+        embedding = embedding.cpu().numpy()[0]
             
         self.document_embeddings[doc_id] = embedding
         return embedding
             
     def cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors"""
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        """Calculate cosine similarity between two vectors (unit-norm from encode, so a dot product)"""
+        return float(np.dot(vec1, vec2))
     
     def batch_embed_documents(self, documents: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
         """Batch embed documents for efficiency"""
@@ -176,18 +198,14 @@ class LambdaGPUEmbeddingManager:
             batch = documents[i:i + self.batch_size]
             doc_ids, contents = zip(*batch)
             
-            with torch.cuda.amp.autocast() if self.device == "cuda" else torch.no_grad():
+            with torch.inference_mode():
                 batch_embeddings = model.encode(
                     contents, 
                     convert_to_tensor=True, 
+                    normalize_embeddings=True,
                     show_progress_bar=False,
                     batch_size=self.batch_size
-                )
-                
-                if self.device == "cuda":
-                    batch_embeddings = batch_embeddings.cpu().numpy()
-                else:
-                    batch_embeddings = batch_embeddings.numpy()
+                ).cpu().numpy()
             
             for j, doc_id in enumerate(doc_ids):
                 embeddings[doc_id] = batch_embeddings[j]
@@ -202,6 +220,10 @@ class LambdaGPUChromaService:
         self.collections_cache = []
         self.last_cache_update = 0
         self.cache_ttl = 300  # 5 minutes
+        # Last known collection list, so a listing failure doesn't mean probing names from scratch
+        self.collections_file = os.getenv('COLLECTIONS_CACHE_FILE', 'collections.json')
+        self.collection_probe_chunk = 16
+        self.empty_cache_ttl = 30  # An empty result is retried sooner, but not on every request
         
     def get_client(self):
         """Get or create ChromaDB client"""
@@ -228,7 +250,8 @@ class LambdaGPUChromaService:
         """Get batch collections with caching and fallback"""
         current_time = time.time()
         
-        if not force_refresh and self.collections_cache and (current_time - self.last_cache_update) < self.cache_ttl:
+        ttl = self.cache_ttl if self.collections_cache else self.empty_cache_ttl
+        if not force_refresh and (current_time - self.last_cache_update) < ttl:
             return self.collections_cache
         
         try:
@@ -236,6 +259,7 @@ class LambdaGPUChromaService:
             all_collections = []
             offset = 0
             limit = 1000
+            listing_complete = True
             
             # Get all collections with pagination
             while True:
@@ -249,6 +273,7 @@ class LambdaGPUChromaService:
                     offset += limit
                 except Exception as e:
                     logger.warning(f"[LAMBDA GPU] Error fetching collections batch: {e}")
+                    listing_complete = False
                     break
             
             # Filter for batch collections
@@ -257,6 +282,12 @@ class LambdaGPUChromaService:
                 if 'batch' in col.name.lower() or 'ultra_optimized' in col.name.lower()
             ]
             
+            if not listing_complete and not batch_collections:
+                raise RuntimeError("collection listing failed")
+            
+            # A partial or empty listing must not overwrite the last good file
+            if listing_complete and batch_collections and batch_collections != self.collections_cache:
+                self._save_collections_file(batch_collections)
             self.collections_cache = batch_collections
             self.last_cache_update = current_time
             
@@ -265,11 +296,13 @@ class LambdaGPUChromaService:
             
         except Exception as e:
             logger.error(f"[LAMBDA GPU] Error getting collections: {e}")
-            # Fallback: Generate collection names based on known pattern
+            # Fallback: the list saved by an earlier run, else probe the known naming pattern
             logger.warning("[LAMBDA GPU] Using fallback collection names due to error")
-            fallback_collections = []
-            for i in range(1, 1001):  # Generate 1000 collection names
-                fallback_collections.append(f"documents_ultra_optimized_batch_{i}")
+            fallback_collections = self._load_collections_file()
+            if not fallback_collections:
+                fallback_collections = self._probe_collections()
+                if fallback_collections:
+                    self._save_collections_file(fallback_collections)
             
             # Update cache
             self.collections_cache = fallback_collections
@@ -277,6 +310,54 @@ class LambdaGPUChromaService:
             logger.info(f"[LAMBDA GPU] Using fallback: {len(fallback_collections)} collections")
             return fallback_collections
     
+    def _load_collections_file(self) -> List[str]:
+        """Collection names saved by an earlier run (empty if there is no readable file)"""
+        try:
+            with open(self.collections_file, 'r') as f:
+                saved = json.load(f)
+            logger.info(f"[LAMBDA GPU] Loaded {len(saved['collections'])} collection names saved at {time.ctime(saved['mtime'])}")
+            return list(saved['collections'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+    
+    def _save_collections_file(self, collections: List[str]):
+        """Persist the collection list (atomically) for the next startup's fallback"""
+        try:
+            tmp_file = self.collections_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump({'mtime': time.time(), 'collections': collections}, f)
+            os.replace(tmp_file, self.collections_file)
+        except OSError as e:
+            logger.warning(f"[LAMBDA GPU] Could not save collection list: {e}")
+    
+    def _probe_collections(self) -> List[str]:
+        """Find batch collections by name, one concurrent chunk at a time; stops after two
+        consecutive chunks in which none exist"""
+        try:
+            client = self.get_client()
+        except Exception as e:
+            logger.warning(f"[LAMBDA GPU] Cannot probe collections: {e}")
+            return []
+        
+        def exists(collection_name: str) -> bool:
+            try:
+                client.get_collection(collection_name)
+                return True
+            except Exception:
+                return False
+        
+        found = []
+        empty_chunks = 0
+        start = 1
+        with ThreadPoolExecutor(max_workers=self.collection_probe_chunk) as executor:
+            while empty_chunks < 2:
+                names = [f"documents_ultra_optimized_batch_{i}" for i in range(start, start + self.collection_probe_chunk)]
+                hits = [name for name, ok in zip(names, executor.map(exists, names)) if ok]
+                found.extend(hits)
+                empty_chunks = 0 if hits else empty_chunks + 1
+                start += self.collection_probe_chunk
+        return found
+    
     def search_documents_parallel(self, query_embedding: np.ndarray, n_results: int = 10) -> List[Dict[str, Any]]:
         """Parallel search across collections for maximum speed"""
         try:
@@ -375,13 +456,16 @@ class LambdaGPUUniversityRAGChatbot:
             streaming=False
         )
         
-        # Initialize OpenAI embeddings for fallback
-        self.openai_embeddings = OpenAIEmbeddings(
+        logger.info("[LAMBDA GPU] Chatbot initialized successfully")
+    
+    @cached_property
+    def openai_embeddings(self):
+        """OpenAI embeddings fallback, built on first use instead of at startup"""
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(
             model="text-embedding-3-small",
             openai_api_key=self.openai_api_key
         )
-        
-        logger.info("[LAMBDA GPU] Chatbot initialized successfully")
     
     def get_gpu_info(self) -> Dict[str, Any]:
         """Get GPU information for monitoring"""
@@ -519,9 +603,10 @@ Answer:"""
         
         logger.info(f"[LAMBDA GPU] Processing question: {question[:100]}...")
         
-        # Search for relevant documents
+        # Search for relevant documents; one inference_mode scope covers every forward pass below it
         search_start = time.time()
-        documents = self.search_documents(question, n_results=10)
+        with torch.inference_mode():
+            documents = self.search_documents(question, n_results=10)
         search_time = time.time() - search_start
         
         # Generate answer
@@ -6,29 +6,160 @@ Ultra-fast RAG chatbot with GPU acceleration for Lambda Labs deployment
 import os
 import sys
 import time
+
+# Let CUDA allocator segments grow instead of fragmenting (must be set before torch initializes CUDA)
+os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'expandable_segments:True')
+
 import torch
 import numpy as np
 import hashlib
-import pickle
-from typing import Dict, Any, List, Optional, Tuple
+import json
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from dataclasses import dataclass
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
+from services.chat_service._topk_numba import topk, warm_up as warm_up_topk
+from services.chat_service._embedding_batcher import EmbeddingBatcher
+from services.chat_service._chroma_http2 import use_http2_session
 import asyncio
+import threading
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import rmm
+    from rmm.allocators.torch import rmm_torch_allocator
+    RMM_AVAILABLE = True
+except ImportError:
+    RMM_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _use_rmm_allocator() -> bool:
+    """Route PyTorch's CUDA allocations through an RMM pool, so RAPIDS/CuPy code in the same
+    process shares one pool instead of competing with torch's caching allocator. Must run
+    before the first CUDA tensor is created; opt in with USE_RMM_ALLOCATOR=true."""
+    if not RMM_AVAILABLE or os.getenv('USE_RMM_ALLOCATOR', 'false').lower() != 'true' or not torch.cuda.is_available():
+        return False
+    try:
+        rmm.reinitialize(pool_allocator=True, initial_pool_size=int(os.getenv('RMM_POOL_SIZE', str(2**33))))
+        torch.cuda.memory.change_current_allocator(rmm_torch_allocator)
+        logger.info("[LAMBDA GPU] PyTorch CUDA allocations served from the RMM pool")
+        return True
+    except Exception as e:
+        logger.warning(f"[LAMBDA GPU] RMM allocator not enabled: {e}")
+        return False
+
+RMM_ALLOCATOR_ACTIVE = _use_rmm_allocator()
+
+# Enhanced prompt for specific, comprehensive answers; request-specific parts are appended after it
+ANSWER_PROMPT_PREFIX = """Answer the Northeastern University question at the end using the provided context.
+
+Instructions:
+- Answer the specific question using the context below
+- Provide detailed, structured information
+- Include specific details like numbers, dates, requirements
+- Be comprehensive and helpful
+
+"""
+
+# Confidence factors (similarity, document count, answer length, source diversity): scale to [0, 1], then weight
+CONFIDENCE_FACTOR_SCALES = np.array([1.0, 1 / 10.0, 1 / 500.0, 1 / 5.0], dtype=np.float32)
+CONFIDENCE_FACTOR_WEIGHTS = np.array([0.4, 0.2, 0.2, 0.2], dtype=np.float32)
+
+# Fields requested from collection.query; embeddings are never read back, so never ship them
+CHROMA_QUERY_INCLUDE = ["documents", "metadatas", "distances"]
+
+def _build_term_matcher(query_terms: set):
+    """Aho-Corasick automaton over the query terms (None when pyahocorasick is missing)"""
+    if not AHOCORASICK_AVAILABLE or not query_terms:
+        return None
+    automaton = ahocorasick.Automaton()
+    for term in query_terms:
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return automaton
+
+def _count_term_hits(text: str, query_terms: set, matcher=None) -> int:
+    """Number of distinct query terms occurring in text, in one linear scan when a matcher is given"""
+    if matcher is not None:
+        return len({term for _, term in matcher.iter(text)}) if text else 0
+    return sum(1 for term in query_terms if term in text)
+
+def _sdpa_self_attention(module):
+    """Forward for a transformers BertSelfAttention that runs PyTorch's fused
+    scaled_dot_product_attention (flash / memory-efficient kernels) instead of materializing
+    the score matrix; falls back to the stock forward when head masks or attention maps are asked for"""
+    stock_forward = module.forward
+    
+    def forward(hidden_states, attention_mask=None, head_mask=None, encoder_hidden_states=None,
+                encoder_attention_mask=None, past_key_value=None, output_attentions=False):
+        if head_mask is not None or output_attentions or encoder_hidden_states is not None:
+            return stock_forward(hidden_states, attention_mask, head_mask, encoder_hidden_states,
+                                 encoder_attention_mask, past_key_value, output_attentions)
+        batch, seq_len, _ = hidden_states.shape
+        
+        def heads(x):
+            return x.view(batch, seq_len, module.num_attention_heads, module.attention_head_size).transpose(1, 2)
+        
+        # attention_mask is BERT's additive (batch, 1, 1, seq) mask, which SDPA broadcasts as is
+        context = torch.nn.functional.scaled_dot_product_attention(
+            heads(module.query(hidden_states)),
+            heads(module.key(hidden_states)),
+            heads(module.value(hidden_states)),
+            attn_mask=attention_mask,
+            dropout_p=module.dropout.p if module.training else 0.0,
+            is_causal=False
+        )
+        return (context.transpose(1, 2).reshape(batch, seq_len, module.all_head_size),)
+    
+    return forward
+
+def _use_sdpa_attention(backbone) -> int:
+    """Patch every encoder self-attention layer of a BERT-family backbone to use fused SDPA;
+    returns the number of layers patched"""
+    if not hasattr(torch.nn.functional, 'scaled_dot_product_attention'):
+        return 0
+    patched = 0
+    for module in backbone.modules():
+        if (type(module).__name__ == 'BertSelfAttention' and not module.is_decoder
+                and getattr(module, 'position_embedding_type', 'absolute') == 'absolute'):
+            module.forward = _sdpa_self_attention(module)
+            patched += 1
+    return patched
+
 @dataclass
 class ChatResponse:
     """Structured response from the chatbot"""
@@ -39,16 +170,231 @@ class ChatResponse:
     timing: Dict[str, float]
     gpu_info: Dict[str, Any]
 
+class EmbeddingMatrixStore:
+    """id -> embedding cache laid out as one (N, dim) float16 matrix plus an id -> row dict
+    
+    Saved rows are memory-mapped from a .npy file, so loading is O(1) instead of an
+    unpickle of N small arrays; rows added since the last save stay in memory.
+    At most max_rows ids are kept: the least recently used is evicted, and its row is
+    dropped from memory or disk at the next compaction/save.
+    """
+    
+    def __init__(self, matrix_file: str, ids_file: str, max_rows: int = 50000):
+        self.matrix_file = matrix_file
+        self.ids_file = ids_file
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+    
+    def clear(self):
+        self.rows = OrderedDict()  # least recently used first
+        self.version = getattr(self, 'version', 0) + 1  # bumped whenever the set of rows changes
+        self._matrix = None
+        self._saved_rows = 0
+        self._pending = []
+        self._dirty = False
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def __contains__(self, key) -> bool:
+        return key in self.rows
+    
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def get(self, key) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.rows.move_to_end(key)
+        if row < self._saved_rows:
+            return np.array(self._matrix[row])
+        return self._pending[row - self._saved_rows]
+    
+    def add(self, key, embedding: np.ndarray):
+        if key in self.rows:
+            return
+        if len(self.rows) >= self.max_rows:
+            self.rows.popitem(last=False)
+        self.rows[key] = self._saved_rows + len(self._pending)
+        self._pending.append(np.asarray(embedding, dtype=np.float16))
+        self._dirty = True
+        self.version += 1
+        
+        # Evicted rows still occupy the pending list; reclaim them before it outgrows the bound
+        if len(self._pending) >= 2 * self.max_rows:
+            self._compact_pending()
+    
+    def _compact_pending(self):
+        live = [(key, row) for key, row in self.rows.items() if row >= self._saved_rows]
+        self._pending = [self._pending[row - self._saved_rows] for _, row in live]
+        for new_row, (key, _) in enumerate(live, self._saved_rows):
+            self.rows[key] = new_row
+        self.version += 1
+    
+    def matrix(self) -> np.ndarray:
+        """All live rows (in id order) as one contiguous (N, dim) array; what save() writes"""
+        if not self._saved_rows and not self._pending:
+            return np.zeros((0, 0), dtype=np.float16)
+        if not self._pending:
+            base = self._matrix  # gather straight from the memory map, no intermediate copy
+        elif not self._saved_rows:
+            base = np.stack(self._pending)
+        else:
+            base = np.concatenate([self._matrix, np.stack(self._pending)])
+        rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(self.rows))
+        return base[rows]
+    
+    def load(self):
+        if os.path.exists(self.matrix_file) and os.path.exists(self.ids_file):
+            with open(self.ids_file, 'r') as f:
+                ids = json.load(f)
+            self.clear()
+            self._matrix = np.load(self.matrix_file, mmap_mode='r')
+            self._saved_rows = len(ids)
+            # Files are written least recently used first, so the newest max_rows survive
+            for row, key in enumerate(ids[-self.max_rows:], max(0, len(ids) - self.max_rows)):
+                self.rows[key] = row
+    
+    def save(self):
+        if not self._dirty:
+            return
+        ids = list(self.rows)
+        
+        # Write beside the live files and swap, so the current mapping stays valid
+        np.save(f"{self.matrix_file}.tmp.npy", self.matrix())
+        with open(f"{self.ids_file}.tmp", 'w') as f:
+            json.dump(ids, f)
+        os.replace(f"{self.matrix_file}.tmp.npy", self.matrix_file)
+        os.replace(f"{self.ids_file}.tmp", self.ids_file)
+        
+        self._matrix = np.load(self.matrix_file, mmap_mode='r')
+        self._saved_rows = len(ids)
+        self.rows = OrderedDict((key, row) for row, key in enumerate(ids))
+        self._pending = []
+        self._dirty = False
+        self.version += 1
+
+class AnswerCache:
+    """Two-tier LRU cache of generate_answer results
+    
+    An exact (normalized) question match is tried first; otherwise the nearest
+    previously answered question is reused when the cosine similarity of the
+    (already L2-normalized) query embeddings reaches threshold. Entries persist
+    as a .npy matrix of question vectors plus a JSON list of results.
+    """
+    
+    def __init__(self, path_prefix: str, threshold: float = 0.95, max_entries: int = 1024):
+        self.vectors_file = f"{path_prefix}.f32.npy"
+        self.entries_file = f"{path_prefix}.json"
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.clear()
+    
+    def clear(self):
+        self._entries = OrderedDict()  # question key -> (row, result), least recently used first
+        self._vectors = None
+        self._row_keys = [None] * self.max_entries
+        self._used = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    @staticmethod
+    def _key(question: str) -> str:
+        return ' '.join(question.lower().split())
+    
+    def lookup(self, question: str, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        key = self._key(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._used:
+                query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+                if SIMSIMD_AVAILABLE:
+                    # One SIMD pass per cached vector; avoids BLAS call overhead on a small matrix
+                    sims = 1.0 - np.asarray(simsimd.cdist(query, self._vectors[:self._used], metric='cosine'), dtype=np.float32)[0]
+                else:
+                    sims = self._vectors[:self._used] @ query[0]
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = self._row_keys[best]
+                    entry = self._entries[key]
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def add(self, question: str, embedding: np.ndarray, result: Dict[str, Any]):
+        key = self._key(question)
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if key in self._entries:
+                row = self._entries.pop(key)[0]
+            elif len(self._entries) >= self.max_entries:
+                _, (row, _) = self._entries.popitem(last=False)  # reuse the evicted row
+            else:
+                row = self._used
+                self._used += 1
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._vectors[row] = vector
+            self._row_keys[row] = key
+            self._entries[key] = (row, result)
+    
+    def load(self):
+        if not (os.path.exists(self.vectors_file) and os.path.exists(self.entries_file)):
+            return
+        with open(self.entries_file, 'r') as f:
+            entries = json.load(f)[-self.max_entries:]
+        vectors = np.load(self.vectors_file)
+        self.clear()
+        for entry in entries:
+            self.add(entry['question'], vectors[entry['row']], entry['result'])
+    
+    def save(self):
+        with self._lock:
+            if self._vectors is None:
+                return
+            entries = [{'question': key, 'row': row, 'result': result} for key, (row, result) in self._entries.items()]
+            vectors = self._vectors[:self._used].copy()
+        np.save(f"{self.vectors_file}.tmp.npy", vectors)
+        with open(f"{self.entries_file}.tmp", 'w') as f:
+            json.dump(entries, f, default=float)  # numpy scalars in scores
+        os.replace(f"{self.vectors_file}.tmp.npy", self.vectors_file)
+        os.replace(f"{self.entries_file}.tmp", self.entries_file)
+
 class LambdaGPUEmbeddingManager:
     """Ultra-optimized GPU embedding manager for Lambda Labs"""
     
-    def __init__(self, cache_file: str = "lambda_gpu_embeddings_cache.pkl"):
-        self.cache_file = cache_file
-        self.embeddings_cache = {}
-        self.document_embeddings = {}
+    def __init__(self, cache_dir: str = "lambda_gpu_embeddings_cache"):
+        self.cache_dir = cache_dir
+        self.embeddings_cache = EmbeddingMatrixStore(
+            os.path.join(cache_dir, "query_embs_norm.f16.npy"), os.path.join(cache_dir, "query_ids_norm.json"),
+            max_rows=int(os.getenv('QUERY_CACHE_CAPACITY', '50000'))
+        )
+        # Rows are stored L2-normalized (the "_norm" files), so cosine similarity is a plain dot product
+        self.document_embeddings = EmbeddingMatrixStore(
+            os.path.join(cache_dir, "doc_embs_norm.f16.npy"), os.path.join(cache_dir, "doc_ids_norm.json"),
+            max_rows=int(os.getenv('DOCUMENT_CACHE_CAPACITY', '100000'))
+        )
         self.model = None
         self.device = self._get_optimal_device()
         self.batch_size = 32  # Optimized for GPU memory
+        # Bulk document encoding (CUDA) runs far larger batches than interactive queries
+        self.document_batch_size = int(os.getenv('DOCUMENT_EMBED_BATCH_SIZE', '512'))
+        self._query_cache_lock = threading.Lock()
+        
+        # Micro-batching of concurrent query embeddings
+        self.micro_batch_ms = float(os.getenv('EMBEDDING_MICRO_BATCH_MS', '5'))
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+        
         self.load_cache()
         
         logger.info(f"[LAMBDA GPU] Initialized on device: {self.device}")
@@ -56,6 +402,16 @@ class LambdaGPUEmbeddingManager:
     def _get_optimal_device(self) -> str:
         """Get optimal device for Lambda Labs GPU"""
         if torch.cuda.is_available():
+            # Bound the caching allocator's pool so it grows up to a fixed share of the card and is reused
+            # (under RMM the pool is sized by RMM_POOL_SIZE instead)
+            memory_fraction = float(os.getenv('GPU_MEMORY_FRACTION', '0.8'))
+            if 0 < memory_fraction < 1 and not RMM_ALLOCATOR_ACTIVE:
+                torch.cuda.set_per_process_memory_fraction(memory_fraction, 0)
+            
+            # Any fp32 GEMM left on the GPU (CPU-loaded weights, fp32 heads) runs on tensor cores
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            
             gpu_name = torch.cuda.get_device_name(0)
             gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
             logger.info(f"[LAMBDA GPU] GPU: {gpu_name}, Memory: {gpu_memory:.1f}GB")
@@ -77,29 +433,24 @@ class LambdaGPUEmbeddingManager:
             return "cpu"
     
     def load_cache(self):
-        """Load embeddings cache with error handling"""
+        """Memory-map the query and document embedding matrices"""
         try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'rb') as f:
-                    cache_data = pickle.load(f)
-                    self.embeddings_cache = cache_data.get('query_cache', {})
-                    self.document_embeddings = cache_data.get('document_embeddings', {})
-                logger.info(f"[LAMBDA GPU] Loaded cache: {len(self.embeddings_cache)} queries, {len(self.document_embeddings)} documents")
+            self.embeddings_cache.load()
+            self.document_embeddings.load()
+            logger.info(f"[LAMBDA GPU] Loaded cache: {len(self.embeddings_cache)} queries, {len(self.document_embeddings)} documents")
         except Exception as e:
             logger.error(f"[LAMBDA GPU] Error loading cache: {e}")
-            self.embeddings_cache = {}
-            self.document_embeddings = {}
+            self.embeddings_cache.clear()
+            self.clear_document_embeddings()
     
     def save_cache(self):
-        """Save embeddings cache with error handling"""
+        """Append new embeddings to the on-disk matrices"""
         try:
-            cache_data = {
-                'query_cache': self.embeddings_cache,
-                'document_embeddings': self.document_embeddings
-            }
-            with open(self.cache_file, 'wb') as f:
-                pickle.dump(cache_data, f)
-            logger.info(f"[LAMBDA GPU] Saved cache: {len(self.embeddings_cache)} queries, {len(self.document_embeddings)} documents")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.embeddings_cache.save()
+            self.document_embeddings.save()
+            logger.info(f"[LAMBDA GPU] Saved cache: {len(self.embeddings_cache)} queries, {len(self.document_embeddings)} documents "
+                        f"(hit rate: queries {self.embeddings_cache.hit_rate():.1%}, documents {self.document_embeddings.hit_rate():.1%})")
         except Exception as e:
             logger.error(f"[LAMBDA GPU] Error saving cache: {e}")
     
@@ -116,93 +467,227 @@ class LambdaGPUEmbeddingManager:
             # Optimize for GPU
             if self.device == "cuda":
                 self.model = self.model.half()  # Use FP16 for memory efficiency
-                torch.cuda.empty_cache()
+            
+            # Fused attention: one SDPA kernel per layer instead of matmul + softmax + matmul
+            if os.getenv('EMBEDDING_SDPA', 'true').lower() == 'true':
+                try:
+                    patched = _use_sdpa_attention(self.model[0].auto_model)
+                    if patched:
+                        logger.info("[LAMBDA GPU] Embedding model attention uses fused SDPA (%d layers)", patched)
+                except Exception as e:
+                    logger.warning(f"[LAMBDA GPU] Fused SDPA attention not applied: {e}")
+            
+            # Fuse the transformer backbone's kernels; same switch as lambda_gpu_chatbot.py
+            if os.getenv('EMBEDDING_TORCH_COMPILE', 'false').lower() == 'true' and hasattr(torch, 'compile'):
+                try:
+                    # dynamic=True: sequence length varies per batch, avoid a recompile per shape
+                    self.model[0].auto_model = torch.compile(self.model[0].auto_model, dynamic=True)
+                    with torch.inference_mode():
+                        self.model.encode(["warm up"], show_progress_bar=False)  # pay compilation here, not on the first query
+                    logger.info("[LAMBDA GPU] Compiled embedding model with torch.compile")
+                except Exception as e:
+                    logger.warning(f"[LAMBDA GPU] torch.compile not applied: {e}")
             
             logger.info(f"[LAMBDA GPU] Model loaded on {self.device}")
         return self.model
     
     def get_document_hash(self, content: str) -> str:
-        """Generate hash for document content"""
+        """Generate hash for document content (xxh3-128 when available, MD5 otherwise)"""
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_128_hexdigest(content)
         return hashlib.md5(content.encode()).hexdigest()
     
     def get_query_embedding(self, content: str) -> np.ndarray:
-        """Get embedding for query content with GPU acceleration"""
+        """Get embedding for query content; misses from concurrent callers share one forward pass"""
         doc_hash = self.get_document_hash(content)
         
-        if doc_hash in self.embeddings_cache:
-            return self.embeddings_cache[doc_hash]
-        
-        model = self.get_embedding_model()
+        with self._query_cache_lock:
+            cached = self.embeddings_cache.get(doc_hash)
+            if cached is None and XXHASH_AVAILABLE:
+                # Entries cached before the switch from MD5 are still keyed by the old digest
+                cached = self.embeddings_cache.get(hashlib.md5(content.encode()).hexdigest())
+                if cached is not None:
+                    self.embeddings_cache.add(doc_hash, cached)
+        if cached is not None:
+            return cached
         
-        # GPU-optimized embedding generation
-        with torch.cuda.amp.autocast() if self.device == "cuda" else torch.no_grad():
-            embedding = model.encode([content], convert_to_tensor=True, show_progress_bar=False)
-            if self.device == "cuda":
-                embedding = embedding.cpu().numpy()[0]
-            else:
-                embedding = embedding.numpy()[0]
-        
-        self.embeddings_cache[doc_hash] = embedding
+        embedding = self._get_batcher().submit(content).result()
+        with self._query_cache_lock:
+            self.embeddings_cache.add(doc_hash, embedding)
         return embedding
     
+    def _get_batcher(self) -> EmbeddingBatcher:
+        """Start the micro-batching thread on first use"""
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = EmbeddingBatcher(self.embed_batch, self.batch_size, self.micro_batch_ms)
+        return self._batcher
+    
+    def get_query_embeddings(self, contents: List[str]) -> List[np.ndarray]:
+        """Query embeddings for many texts, encoding every cache miss in one forward pass"""
+        hashes = [self.get_document_hash(content) for content in contents]
+        with self._query_cache_lock:
+            embeddings = [self.embeddings_cache.get(doc_hash) for doc_hash in hashes]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.embed_batch([contents[i] for i in missing])
+            with self._query_cache_lock:
+                for i, embedding in zip(missing, encoded):
+                    self.embeddings_cache.add(hashes[i], embedding)
+                    embeddings[i] = embedding
+        return embeddings
+    
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Uncached normalized FP16 embeddings, (len(texts), dim), from a single padded forward pass
+        (e.g. for reranking retrieved previews)"""
+        if not texts:
+            return np.zeros((0, self.get_embedding_model().get_sentence_embedding_dimension()), dtype=np.float16)
+        model = self.get_embedding_model()
+        with torch.inference_mode():
+            return model.encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+                batch_size=len(texts)
+            ).astype(np.float16, copy=False)
+    
     def get_document_embedding(self, doc_id: str, content: str) -> np.ndarray:
         """Get embedding for document content with GPU acceleration"""
-        if doc_id in self.document_embeddings:
-            return self.document_embeddings[doc_id]
+        cached = self.document_embeddings.get(doc_id)
+        if cached is not None:
+            return cached
         
+        embedding = self._encode_single(content)
+        self.document_embeddings.add(doc_id, embedding)
+        return embedding
+    
+    def clear_document_embeddings(self):
+        """Drop every cached document embedding"""
+        self.document_embeddings.clear()
+    
+    def _encode_single(self, content: str) -> np.ndarray:
+        """Encode one text to a normalized FP16 vector (the uncached path of both lookups)"""
         model = self.get_embedding_model()
         
-        # GPU-optimized embedding generation
-        with torch.cuda.amp.autocast() if self.device == "cuda" else torch.no_grad():
-            embedding = model.encode([content], convert_to_tensor=True, show_progress_bar=False)
-            if self.device == "cuda":
-                embedding = embedding.cpu().numpy()[0]
-            else:
-                embedding = embedding.numpy()[0]
-            
-        self.document_embeddings[doc_id] = embedding
-        return embedding
+        # The model is already FP16 on GPU, so autocast is a no-op; encode straight to numpy
+        # instead of tensor -> synchronizing .cpu() copy -> numpy
+        with torch.inference_mode():
+            embedding = model.encode([content], convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)[0]
+        
+        # Keep FP16 end-to-end; callers that need FP32 (ChromaDB, FAISS) cast at their boundary
+        return embedding.astype(np.float16, copy=False)
             
     def cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors"""
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        """Calculate cosine similarity between two normalized vectors"""
+        if SIMSIMD_AVAILABLE:
+            if vec1.dtype != np.float16 or vec2.dtype != np.float16:
+                # Mixed or f32 inputs go through the f32 kernel; matching f16 stays native, no upcast copy
+                vec1, vec2 = vec1.astype(np.float32, copy=False), vec2.astype(np.float32, copy=False)
+            return 1.0 - float(simsimd.cosine(vec1, vec2))
+        return float(np.dot(vec1.astype(np.float32), vec2.astype(np.float32)))
+    
+    def batch_cosine(self, query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Cosine similarity of one query against every row of matrix, in a single call"""
+        query = np.asarray(query).reshape(1, -1)
+        if not SIMSIMD_AVAILABLE:
+            return matrix.astype(np.float32) @ query[0].astype(np.float32)
+        if query.dtype != np.float16 or matrix.dtype != np.float16:
+            query, matrix = query.astype(np.float32, copy=False), matrix.astype(np.float32, copy=False)
+        return 1.0 - np.asarray(simsimd.cdist(query, matrix, metric='cosine'), dtype=np.float32)[0]
     
     def batch_embed_documents(self, documents: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
         """Batch embed documents for efficiency"""
         model = self.get_embedding_model()
         embeddings = {}
         
+        if self.device == "cuda":
+            return self._batch_embed_streamed(model, documents)
+        
         # Process in batches for GPU efficiency
         for i in range(0, len(documents), self.batch_size):
             batch = documents[i:i + self.batch_size]
             doc_ids, contents = zip(*batch)
             
-            with torch.cuda.amp.autocast() if self.device == "cuda" else torch.no_grad():
+            with torch.inference_mode():
                 batch_embeddings = model.encode(
                     contents, 
-                    convert_to_tensor=True, 
+                    convert_to_numpy=True, 
+                    normalize_embeddings=True,
                     show_progress_bar=False,
                     batch_size=self.batch_size
                 )
-                
-                if self.device == "cuda":
-                    batch_embeddings = batch_embeddings.cpu().numpy()
-                else:
-                    batch_embeddings = batch_embeddings.numpy()
             
+            batch_embeddings = batch_embeddings.astype(np.float16, copy=False)
             for j, doc_id in enumerate(doc_ids):
                 embeddings[doc_id] = batch_embeddings[j]
             
         return embeddings
+    
+    def _batch_embed_streamed(self, model, documents: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
+        """Double-buffered batch embedding: batch i encodes on one CUDA stream while batch i-1's
+        results are copied device-to-host into a pinned buffer on the other"""
+        batch_size = self.document_batch_size
+        dim = model.get_sentence_embedding_dimension()
+        streams = [torch.cuda.Stream(), torch.cuda.Stream()]
+        pinned = [torch.empty((batch_size, dim), dtype=torch.float16, pin_memory=True) for _ in streams]
+        done = [None, None]
+        pending = [None, None]
+        embeddings = {}
+        
+        def drain(slot):
+            if pending[slot] is None:
+                return
+            done[slot].synchronize()
+            host = pinned[slot][:len(pending[slot])].numpy().copy()  # the buffer is reused two batches later
+            for j, doc_id in enumerate(pending[slot]):
+                embeddings[doc_id] = host[j]
+            pending[slot] = None
+        
+        for batch_no, i in enumerate(range(0, len(documents), batch_size)):
+            slot = batch_no % 2
+            drain(slot)  # batch i-2 shared this buffer
+            doc_ids, contents = zip(*documents[i:i + batch_size])
+            
+            with torch.cuda.stream(streams[slot]), torch.inference_mode():
+                batch_embeddings = model.encode(
+                    contents,
+                    convert_to_tensor=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                    batch_size=batch_size
+                )
+                pinned[slot][:len(doc_ids)].copy_(batch_embeddings, non_blocking=True)
+                done[slot] = torch.cuda.Event()
+                done[slot].record(streams[slot])
+            pending[slot] = doc_ids
+        
+        # Drain in batch order so the result dict keeps the input order
+        last = (len(documents) - 1) // batch_size % 2 if documents else 0
+        drain(1 - last)
+        drain(last)
+        return embeddings
             
 class LambdaGPUChromaService:
     """GPU-optimized ChromaDB service for Lambda Labs"""
     
     def __init__(self):
         self.client = None
-        self.collections_cache = []
-        self.last_cache_update = 0
-        self.cache_ttl = 3600  # 1 hour for speed
+        self.performance_mode = os.getenv('PERFORMANCE_MODE', 'unified').lower()
+        
+        # In-process ANN over the unified collection; Chroma is only read once to build it
+        self.local_index_enabled = FAISS_AVAILABLE and os.getenv('LOCAL_FAISS_INDEX', 'true').lower() == 'true'
+        self._faiss_index = None
+        self._faiss_docs = []
+        # On CUDA the snapshot is ranked exactly on the device instead (fp16 matmul + topk)
+        self.gpu_index_enabled = torch.cuda.is_available() and os.getenv('LOCAL_INDEX_GPU', 'true').lower() == 'true'
+        self._faiss_matrix_gpu = None
+        self._faiss_building = False
+        self._faiss_lock = threading.Lock()  # Concurrent searches must not start two builds
+        # A failed build (a full download of the collection) is not retried before this
+        self.faiss_retry_seconds = float(os.getenv('LOCAL_FAISS_RETRY_SECONDS', '600'))
+        self._faiss_failed_at = None
         
     def get_client(self):
         """Get or create ChromaDB client with multiple authentication methods"""
@@ -253,6 +738,9 @@ class LambdaGPUChromaService:
                 except Exception as fallback_e:
                     logger.error(f"[LAMBDA GPU] Fallback connection also failed: {fallback_e}")
                     raise
+            
+            if os.getenv('CHROMA_HTTP2', 'false').lower() == 'true':
+                use_http2_session(self.client)
                     
         return self.client
     
@@ -278,86 +766,51 @@ class LambdaGPUChromaService:
                 'status': 'unified'
             }
 
-    def get_batch_collections(self, force_refresh: bool = False) -> List[str]:
-        """Get batch collections with caching and fallback"""
-        current_time = time.time()
-        
-        # Use cache for speed unless force refresh is requested
-        if not force_refresh and self.collections_cache and (current_time - self.last_cache_update) < self.cache_ttl:
-            logger.info(f"[LAMBDA GPU] Using cached collections: {len(self.collections_cache)} collections")
-            return self.collections_cache
-        
-        try:
-            client = self.get_client()
-            all_collections = []
-            offset = 0
-            limit = 1000
-            
-            # Get all collections with pagination
-            while True:
-                try:
-                    collections_batch = client.list_collections(limit=limit, offset=offset)
-                    if not collections_batch or len(collections_batch) == 0:
-                        break
-                    all_collections.extend(collections_batch)
-                    logger.info(f"[LAMBDA GPU] Fetched batch {offset//limit + 1}: {len(collections_batch)} collections (total so far: {len(all_collections)})")
-                    if len(collections_batch) < limit:
-                        break
-                    offset += limit
-                except Exception as e:
-                    logger.warning(f"[LAMBDA GPU] Error fetching collections batch: {e}")
-                    break
-            
-            # Use ALL collections for comprehensive search (not just batch collections)
-            batch_collections = [col.name for col in all_collections]
-            
-            self.collections_cache = batch_collections
-            self.last_cache_update = current_time
-            
-            logger.info(f"[LAMBDA GPU] Found {len(batch_collections)} total collections for comprehensive search (out of {len(all_collections)} total collections retrieved)")
-            return batch_collections
-            
-        except Exception as e:
-            logger.error(f"[LAMBDA GPU] Error getting collections: {e}")
-            # Fallback: Generate collection names based on known pattern
-            logger.warning("[LAMBDA GPU] Using fallback collection names due to error")
-            fallback_collections = []
-            for i in range(1, 3281):  # Generate 3280 collection names to match actual database
-                fallback_collections.append(f"documents_ultra_optimized_batch_{i}")
-            
-            # Update cache
-            self.collections_cache = fallback_collections
-            self.last_cache_update = current_time
-            logger.info(f"[LAMBDA GPU] Using fallback: {len(fallback_collections)} collections")
-            return fallback_collections
-    
     def search_documents_unified(self, query_embedding: np.ndarray, n_results: int = 10, query: str = "") -> List[Dict[str, Any]]:
         """Ultra-fast search in unified collection with 80,000 records"""
         try:
-            client = self.get_client()
+            # Performance mode settings (resolved once in __init__)
+            performance_mode = self.performance_mode
             
-            # Get the unified collection
-            collection = client.get_collection("documents_unified")
-            
-            # Performance mode settings
-            performance_mode = os.getenv('PERFORMANCE_MODE', 'unified').lower()
-            
-            # Adjust search parameters based on performance mode
+            # Adjust search parameters based on performance mode. Only the top n_results hits are
+            # returned (and reranked), so never fetch more than that; the mode only sets the ceiling
             if performance_mode == 'ultra_fast':
-                search_n_results = min(n_results * 3, 15)  # Ultra-fast: 15 results
-                logger.info(f"[LAMBDA GPU] Ultra-fast mode: searching unified collection for {search_n_results} results")
+                search_n_results = min(n_results, 15)  # Ultra-fast: at most 15 results
+                logger.info("[LAMBDA GPU] Ultra-fast mode: searching unified collection for %d results", search_n_results)
             elif performance_mode == 'fast':
-                search_n_results = min(n_results * 5, 30)  # Fast: 30 results
-                logger.info(f"[LAMBDA GPU] Fast mode: searching unified collection for {search_n_results} results")
+                search_n_results = min(n_results, 30)  # Fast: at most 30 results
+                logger.info("[LAMBDA GPU] Fast mode: searching unified collection for %d results", search_n_results)
             else:
-                search_n_results = min(n_results * 8, 50)  # Balanced: 50 results
-                logger.info(f"[LAMBDA GPU] Unified mode: searching unified collection for {search_n_results} results")
+                search_n_results = min(n_results, 50)  # Balanced: at most 50 results
+                logger.info("[LAMBDA GPU] Unified mode: searching unified collection for %d results", search_n_results)
+            
+            if self._faiss_index is not None or self._faiss_matrix_gpu is not None:
+                start_time = time.time()
+                documents = self._search_faiss(query_embedding, search_n_results)
+                search_time = time.time() - start_time
+                logger.info("[LAMBDA GPU] Local index search completed in %.3fs, found %d documents", search_time, len(documents))
+                return documents[:n_results]
+            if (self.local_index_enabled and not self._faiss_building
+                    and (self._faiss_failed_at is None or time.time() - self._faiss_failed_at >= self.faiss_retry_seconds)):
+                with self._faiss_lock:
+                    start_build = not self._faiss_building
+                    self._faiss_building = True
+                if start_build:
+                    threading.Thread(target=self._build_faiss_index, daemon=True).start()
+            
+            client = self.get_client()
+            
+            # Get the unified collection
+            collection = client.get_collection("documents_unified")
             
             # Single collection search - much faster than multi-collection
             start_time = time.time()
             results = collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=search_n_results
+                # A (1, dim) float32 array rather than a Python list: chromadb (1.0.x) converts it once
+                # and serializes the request body with orjson, so no per-float objects are built here
+                query_embeddings=np.asarray(query_embedding, dtype=np.float32)[np.newaxis, :],
+                n_results=search_n_results,
+                include=CHROMA_QUERY_INCLUDE
             )
             search_time = time.time() - start_time
             
@@ -373,13 +826,15 @@ class LambdaGPUChromaService:
                         'content': doc,
                         'metadata': metadata,
                         'distance': distance,
-                        'similarity': 1 - distance
+                        'similarity': 1 - distance,
+                        # Lowered once here instead of on every relevance-scoring pass
+                        '_content_lower': (doc or '').lower(),
+                        '_title_lower': (metadata or {}).get('title', '').lower()
                     })
             
-            # Sort by similarity for better ranking
-            documents.sort(key=lambda x: x.get('similarity', 0), reverse=True)
+            # Chroma already returns hits ordered by distance, so no re-sort is needed
             
-            logger.info(f"[LAMBDA GPU] Unified search completed in {search_time:.2f}s, found {len(documents)} documents")
+            logger.info("[LAMBDA GPU] Unified search completed in %.2fs, found %d documents", search_time, len(documents))
             
             # Return top results
             return documents[:n_results]
@@ -388,41 +843,94 @@ class LambdaGPUChromaService:
             logger.error(f"[LAMBDA GPU] Error in unified search: {e}")
             return []
             
-    def _search_single_collection(self, collection_name: str, query_embedding: np.ndarray, n_results: int) -> List[Dict[str, Any]]:
-        """Search a single collection"""
+    def _build_faiss_index(self, page_size: int = 5000):
+        """Download the unified collection once and index it in-process: a resident fp16 matrix on
+        CUDA, else HNSW (inner product). The index is a snapshot: documents added to Chroma later
+        are not seen until a restart."""
         try:
-            client = self.get_client()
-            collection = client.get_collection(collection_name)
-            
-            results = collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=n_results
-            )
-            
-            documents = []
-            if results and results.get('documents') and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    metadata = results['metadatas'][0][i] if results.get('metadatas') else {}
-                    distance = results['distances'][0][i] if results.get('distances') else 1.0
-                    doc_id = results['ids'][0][i] if results.get('ids') else str(i)
-                    
-                    documents.append({
-                        'id': doc_id,
-                        'content': doc,
-                        'metadata': metadata,
-                        'distance': distance,
-                        'similarity': 1 - distance
-                    })
+            collection = self.get_client().get_collection("documents_unified")
+            vectors, docs = [], []
+            offset = 0
+            while True:
+                page = collection.get(
+                    include=['embeddings', 'documents', 'metadatas'],
+                    limit=page_size,
+                    offset=offset
+                )
+                ids = page.get('ids') or []
+                if not ids:
+                    break
+                vectors.append(np.asarray(page['embeddings'], dtype=np.float32))
+                for doc_id, content, metadata in zip(ids, page['documents'], page['metadatas']):
+                    metadata = metadata or {}
+                    # Lowered copies live beside the index so scoring never re-lowers a document
+                    docs.append((doc_id, content, metadata, (content or '').lower(), metadata.get('title', '').lower()))
+                if len(ids) < page_size:
+                    break
+                offset += page_size
             
-            return documents
+            if not docs:
+                self._faiss_failed_at = time.time()
+                return
+            matrix = np.ascontiguousarray(np.concatenate(vectors))
+            faiss.normalize_L2(matrix)
             
+            self._faiss_docs = docs
+            if self.gpu_index_enabled:
+                try:
+                    self._faiss_matrix_gpu = torch.from_numpy(matrix).to('cuda', dtype=torch.float16)
+                    logger.info(f"[LAMBDA GPU] Local GPU index loaded with {len(docs)} documents")
+                    return
+                except RuntimeError as e:
+                    logger.warning(f"[LAMBDA GPU] Local GPU index not loaded, using HNSW: {e}")
+            index = faiss.IndexHNSWFlat(matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            index.add(matrix)
+            self._faiss_index = index
+            logger.info(f"[LAMBDA GPU] Local FAISS index built with {len(docs)} documents")
         except Exception as e:
-            logger.warning(f"[LAMBDA GPU] Error searching collection {collection_name}: {e}")
-            return []
+            logger.error(f"[LAMBDA GPU] Error building local FAISS index (retry in {self.faiss_retry_seconds:.0f}s): {e}")
+            self._faiss_failed_at = time.time()
+        finally:
+            self._faiss_building = False
+    
+    def _search_faiss(self, query_embedding: np.ndarray, n_results: int) -> List[Dict[str, Any]]:
+        if self._faiss_matrix_gpu is not None:
+            # Query embeddings are already unit-norm; only the k winners come back to the host
+            query = torch.from_numpy(np.ascontiguousarray(query_embedding, dtype=np.float16).reshape(-1)).to('cuda')
+            with torch.inference_mode():
+                scores, indices = torch.topk(self._faiss_matrix_gpu @ query, min(n_results, len(self._faiss_docs)))
+            scores, indices = scores.float().cpu().numpy()[np.newaxis, :], indices.cpu().numpy()[np.newaxis, :]
+        else:
+            query = np.ascontiguousarray(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+            faiss.normalize_L2(query)
+            scores, indices = self._faiss_index.search(query, n_results)
+        
+        documents = []
+        for score, index in zip(scores[0], indices[0]):
+            if index < 0:
+                continue
+            doc_id, content, metadata, content_lower, title_lower = self._faiss_docs[index]
+            documents.append({
+                'id': doc_id,
+                'content': content,
+                'metadata': metadata,
+                'distance': 1 - float(score),
+                'similarity': float(score),
+                '_content_lower': content_lower,
+                '_title_lower': title_lower
+            })
+        return documents
     
 class LambdaGPUUniversityRAGChatbot:
     """Ultra-optimized GPU RAG Chatbot for Lambda Labs"""
     
+    NO_CONTEXT_ANSWER = "I don't have enough information to answer this question about Northeastern University."
+    
+    # Follow-ups embedded ahead of time after each answer (e.g. for suggested-question buttons);
+    # the query-embedding cache is keyed on exact text, so only these exact strings benefit
+    FOLLOWUP_TEMPLATES = ("Tell me more about {topic}", "What are the requirements for {topic}?")
+    FOLLOWUP_STRIP_PREFIXES = ("what is ", "what are ", "tell me about ", "how do i ", "how does ", "how can i ")
+    
     def __init__(self):
         """Initialize the GPU-optimized chatbot"""
         logger.info("[LAMBDA GPU] Initializing Northeastern Chatbot...")
@@ -436,44 +944,107 @@ class LambdaGPUUniversityRAGChatbot:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
+        # Resolve generation settings once instead of per request
+        self.openai_model = os.getenv('OPENAI_MODEL', 'gpt-4.1-mini')  # Faster model
+        self.openai_temperature = float(os.getenv('OPENAI_TEMPERATURE', '0.2'))  # Lower temperature for faster generation
+        self.openai_max_tokens = int(os.getenv('OPENAI_MAX_TOKENS', '300'))  # Reduced tokens for speed
+        
         # Initialize OpenAI LLM with ultra-fast settings
         self.llm = ChatOpenAI(
-            model=os.getenv('OPENAI_MODEL', 'gpt-4.1-mini'),  # Faster model
-            temperature=float(os.getenv('OPENAI_TEMPERATURE', '0.2')),  # Lower temperature for faster generation
-            max_tokens=int(os.getenv('OPENAI_MAX_TOKENS', '300')),  # Reduced tokens for speed
+            model=self.openai_model,
+            temperature=self.openai_temperature,
+            max_tokens=self.openai_max_tokens,
             openai_api_key=self.openai_api_key,
             request_timeout=15,  # Increased timeout to prevent timeouts
             streaming=True,  # Enable streaming for faster time-to-first-token
             max_retries=1  # Reduced retries for speed
         )
         
-        # Initialize OpenAI embeddings for fallback
-        self.openai_embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=self.openai_api_key
-        )
+        # OpenAI embeddings fallback is off the hot path; only import/construct it on request
+        self.openai_embeddings = None
+        if os.getenv('ENABLE_OPENAI_EMBED_FALLBACK', 'false').lower() == 'true':
+            from langchain_openai import OpenAIEmbeddings
+            self.openai_embeddings = OpenAIEmbeddings(
+                model="text-embedding-3-small",
+                openai_api_key=self.openai_api_key
+            )
+        
+        # Static instructions lead the prompt so every request shares the same token prefix,
+        # which the provider's prompt cache can reuse instead of re-prefilling
+        self._static_prefix = ANSWER_PROMPT_PREFIX
+        # Plain format string: no per-call template object or LangChain input validation
+        self._prompt_fmt = ANSWER_PROMPT_PREFIX + "Context: {context}\nQuestion: {question}\n\nAnswer:"
+        
+        # Serializes bulk encodes (batch, prewarm) and cache clearing; per-request search runs outside it
+        self._retrieval_lock = threading.Lock()
+        warm_up_topk()  # JIT (or load the cached build) now rather than on the first request
+        
+        # Rendered (title, url, truncated content) per retrieved document id, LRU-bounded
+        self._doc_fragments = OrderedDict()
+        self.doc_fragment_cache_size = int(os.getenv('DOC_FRAGMENT_CACHE_SIZE', '8192'))
+        
+        # Repeat and near-duplicate questions reuse their answer instead of calling the LLM again
+        self.answer_cache = None
+        if os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true':
+            self.answer_cache = AnswerCache(
+                os.path.join(self.embedding_manager.cache_dir, "answers"),
+                threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95')),
+                max_entries=int(os.getenv('ANSWER_CACHE_SIZE', '1024'))
+            )
+            try:
+                self.answer_cache.load()
+            except Exception as e:
+                logger.warning(f"[LAMBDA GPU] Could not load answer cache: {e}")
+                self.answer_cache.clear()
+        
+        # Speculative follow-up embedding, off the request path and bounded to a few tasks in flight
+        self.prewarm_enabled = os.getenv('QUERY_PREWARM_ENABLED', 'false').lower() == 'true'
+        self.prewarm_max_tasks = int(os.getenv('QUERY_PREWARM_MAX_TASKS', '2'))
+        self._prewarm_tasks = set()
+        
+        # Static GPU metadata is read once; memory counters are re-sampled lazily
+        self._static_gpu_info = self._get_static_gpu_info()
+        self._last_gpu_sample = {}
+        self._last_gpu_sample_time = 0.0
         
         logger.info("[LAMBDA GPU] Chatbot initialized successfully")
     
-    def get_gpu_info(self) -> Dict[str, Any]:
-        """Get GPU information for monitoring"""
+    def _get_static_gpu_info(self) -> Dict[str, Any]:
+        """GPU fields that do not change while the process runs"""
         gpu_info = {
             'cuda_available': torch.cuda.is_available(),
             'device': self.embedding_manager.device,
             'batch_size': self.embedding_manager.batch_size
         }
         
-        if torch.cuda.is_available():
+        if gpu_info['cuda_available']:
             gpu_info.update({
                 'gpu_name': torch.cuda.get_device_name(0),
                 'gpu_memory_total': torch.cuda.get_device_properties(0).total_memory / 1024**3,
-                'gpu_memory_allocated': torch.cuda.memory_allocated(0) / 1024**3,
-                'gpu_memory_cached': torch.cuda.memory_reserved(0) / 1024**3,
                 'cuda_version': torch.version.cuda
             })
         
         return gpu_info
     
+    def get_gpu_info(self) -> Dict[str, Any]:
+        """Get GPU information for monitoring (memory usage sampled at most once per second)"""
+        if self._static_gpu_info['cuda_available']:
+            now = time.monotonic()
+            if now - self._last_gpu_sample_time > 1.0:
+                if RMM_ALLOCATOR_ACTIVE:
+                    # torch keeps no allocator stats for a pluggable allocator; report device usage
+                    free, total = torch.cuda.mem_get_info(0)
+                    used = (total - free) / 1024**3
+                    self._last_gpu_sample = {'gpu_memory_allocated': used, 'gpu_memory_cached': used}
+                else:
+                    self._last_gpu_sample = {
+                        'gpu_memory_allocated': torch.cuda.memory_allocated(0) / 1024**3,
+                        'gpu_memory_cached': torch.cuda.memory_reserved(0) / 1024**3
+                    }
+                self._last_gpu_sample_time = now
+        
+        return {**self._static_gpu_info, **self._last_gpu_sample}
+    
     def search_documents(self, query: str, n_results: int = 10) -> List[Dict[str, Any]]:
         """Ultra-fast document search with GPU acceleration and smart targeting"""
         try:
@@ -501,8 +1072,8 @@ class LambdaGPUUniversityRAGChatbot:
             
             total_time = time.time() - start_time
             
-            logger.info(f"[LAMBDA GPU] Search completed in {total_time:.2f}s (embedding: {embedding_time:.2f}s, search: {search_time:.2f}s)")
-            logger.info(f"[LAMBDA GPU] Found {len(documents)} documents, showing top {len(filtered_docs)} results")
+            logger.info("[LAMBDA GPU] Search completed in %.2fs (embedding: %.2fs, search: %.2fs)", total_time, embedding_time, search_time)
+            logger.info("[LAMBDA GPU] Found %d documents, showing top %d results", len(documents), len(filtered_docs))
             
             return filtered_docs
             
@@ -518,41 +1089,46 @@ class LambdaGPUUniversityRAGChatbot:
     
             # Extract query terms for relevance scoring
             query_terms = set(query.lower().split())
+            matcher = _build_term_matcher(query_terms)
             
             # Score all documents (no filtering)
-            scored_docs = []
-            for doc in documents:
+            scores = np.empty(len(documents), dtype=np.float32)
+            for i, doc in enumerate(documents):
                 # Calculate relevance score
-                relevance_score = self._calculate_relevance_score(doc, query_terms)
+                relevance_score = self._calculate_relevance_score(doc, query_terms, matcher)
                 doc['relevance_score'] = relevance_score
-                scored_docs.append(doc)
+                scores[i] = relevance_score
             
-            # Sort by relevance score (higher is better)
-            scored_docs.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
+            # Select top 10 by relevance score (higher is better) without a full sort
+            top_idx, _ = topk(scores, 10)
             
             # Return top 10 results (no high-quality filtering)
-            return scored_docs[:10]
+            return [documents[i] for i in top_idx]
             
         except Exception as e:
             logger.error(f"[LAMBDA GPU] Error filtering documents: {e}")
             return documents[:10]  # Fallback to top 10 original results
     
-    def _calculate_relevance_score(self, doc: Dict[str, Any], query_terms: set) -> float:
+    def _calculate_relevance_score(self, doc: Dict[str, Any], query_terms: set, matcher=None) -> float:
         """Calculate relevance score for a document - enhanced version from Railway"""
         try:
-            content = doc.get('content', '').lower()
+            content = doc.get('_content_lower')
+            if content is None:
+                content = doc.get('content', '').lower()
             metadata = doc.get('metadata', {})
             
             # Get base similarity from embedding (ensure positive)
             similarity = doc.get('similarity', 0)
             
             # Calculate content relevance to query terms
-            content_matches = sum(1 for term in query_terms if term in content)
+            content_matches = _count_term_hits(content, query_terms, matcher)
             content_relevance = content_matches / len(query_terms) if query_terms else 0
             
             # Boost for title matches
-            title = metadata.get('title', '').lower()
-            title_matches = sum(1 for term in query_terms if term in title)
+            title = doc.get('_title_lower')
+            if title is None:
+                title = metadata.get('title', '').lower()
+            title_matches = _count_term_hits(title, query_terms, matcher)
             title_boost = title_matches / len(query_terms) if query_terms else 0
             
             # Combine scores with proper weighting (Railway logic)
@@ -633,126 +1209,156 @@ Provide a detailed, well-structured answer about Northeastern University:"""
         
         return answer
     
+    def _document_fragment(self, doc: Dict[str, Any], max_content_length: int) -> Tuple[Optional[str], str, str, str]:
+        """(title or None, url, truncated content, preview) for a retrieved document, memoized per doc id
+        
+        The corpus is stable and the same documents keep coming back, so each one is rendered
+        into identical prompt text once instead of on every request.
+        """
+        key = (doc.get('id'), max_content_length)
+        fragment = self._doc_fragments.get(key) if key[0] is not None else None
+        if fragment is not None:
+            self._doc_fragments.move_to_end(key)
+            return fragment
+        
+        content = doc.get('content', '')
+        metadata = doc.get('metadata', {})
+        
+        # Extract meaningful title from metadata
+        title = metadata.get('title', metadata.get('source', metadata.get('file_name', 'Northeastern University Document')))
+        if title == 'Unknown' or not title:
+            title = None  # caller numbers it by rank
+        
+        # Extract URL if available
+        url = metadata.get('url', metadata.get('source_url', ''))
+        
+        # One slice of the source text; the preview is cut from that slice, not the full document
+        truncated = content[:max_content_length]
+        preview = truncated[:200] + "..." if len(truncated) > 200 else truncated
+        if len(content) > max_content_length:
+            truncated += "..."
+        
+        fragment = (title, url, truncated, preview)
+        if key[0] is not None:
+            self._doc_fragments[key] = fragment
+            if len(self._doc_fragments) > self.doc_fragment_cache_size:
+                self._doc_fragments.popitem(last=False)
+        return fragment
+    
+    def _build_prompt(self, question: str, context_docs: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Formatted LLM prompt and source list for the top documents"""
+        # Build optimized context with better metadata extraction
+        context_parts = []
+        sources = []
+        
+        for i, doc in enumerate(context_docs[:5], 1):  # Use 5 documents for speed
+            # Smart truncation: keep minimal content for speed
+            relevance_score = doc.get('relevance_score', 0)
+            if relevance_score > 0.5:  # High relevance documents get more content
+                max_content_length = 500  # Reduced for speed
+            elif relevance_score > 0.3:  # Medium relevance documents get moderate content
+                max_content_length = 350   # Reduced for speed
+            else:  # Lower relevance documents get less content
+                max_content_length = 250   # Reduced for speed
+            
+            title, url, content, preview = self._document_fragment(doc, max_content_length)
+            if title is None:
+                title = f"Northeastern University Document {i}"
+            
+            context_parts.append(f"[Source {i}] {title}\n{content}\n")
+            
+            # Prepare source information
+            sources.append({
+                'title': title,
+                'similarity': doc.get('similarity', 0),
+                'url': url,
+                'content_preview': preview,
+                'rank': i
+            })
+        
+        context = "\n".join(context_parts)
+        
+        return self._prompt_fmt.format_map({'context': context, 'question': question}), sources
+    
+    def _score_answer(self, answer: str, sources: List[Dict[str, Any]], context_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Wrap a generated answer with its sources and confidence"""
+        # Calculate confidence based on multiple factors like Railway code
+        if not context_docs:
+            confidence_percentage = 0.0
+        else:
+            n_docs = len(context_docs)
+            
+            # Average similarity of retrieved documents
+            similarities = np.fromiter((doc.get('similarity', 0) for doc in context_docs), dtype=np.float32, count=n_docs)
+            
+            # Content diversity (different sources)
+            unique_sources = len({doc.get('source_url', '') for doc in context_docs})
+            
+            # Factors (similarity, document count, answer length, source diversity), each capped at 1.0
+            raw_scores = np.array([similarities.mean(), n_docs, len(answer), unique_sources], dtype=np.float32)
+            scores = np.minimum(raw_scores * CONFIDENCE_FACTOR_SCALES, 1.0)
+            
+            # Weighted combination, converted to a percentage
+            overall_confidence = float(scores @ CONFIDENCE_FACTOR_WEIGHTS)
+            confidence_percentage = max(0.0, min(100.0, overall_confidence * 100))
+        
+        if confidence_percentage > 70:
+            confidence = 'high'
+        elif confidence_percentage > 50:
+            confidence = 'medium'
+        else:
+            confidence = 'low'
+        
+        return {
+            'answer': answer,
+            'sources': sources,
+            'confidence': confidence,
+            'confidence_percentage': confidence_percentage,
+            'documents_searched': len(context_docs)
+        }
+    
+    def _no_context_result(self) -> Dict[str, Any]:
+        """Answer for an empty retrieval, returned without an LLM round-trip"""
+        return {
+            'answer': self.NO_CONTEXT_ANSWER,
+            'sources': [],
+            'confidence': 'low',
+            'confidence_percentage': 0.0,
+            'documents_searched': 0
+        }
+    
     def generate_answer(self, question: str, context_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate answer using optimized LLM"""
         try:
             if not context_docs:
-                return {
-                    'answer': "I don't have enough information to answer this question about Northeastern University.",
-                    'sources': [],
-                    'confidence': 'low'
-                }
-            
-            # Build optimized context with better metadata extraction
-            context_parts = []
-            sources = []
-            
-            for i, doc in enumerate(context_docs[:5], 1):  # Use 5 documents for speed
-                content = doc.get('content', '')
-                metadata = doc.get('metadata', {})
-                
-                # Extract meaningful title from metadata
-                title = metadata.get('title', metadata.get('source', metadata.get('file_name', 'Northeastern University Document')))
-                if title == 'Unknown' or not title:
-                    title = f"Northeastern University Document {i}"
-                
-                # Extract URL if available
-                url = metadata.get('url', metadata.get('source_url', ''))
-                
-                # Smart truncation: keep minimal content for speed
-                relevance_score = doc.get('relevance_score', 0)
-                if relevance_score > 0.5:  # High relevance documents get more content
-                    max_content_length = 500  # Reduced for speed
-                elif relevance_score > 0.3:  # Medium relevance documents get moderate content
-                    max_content_length = 350   # Reduced for speed
-                else:  # Lower relevance documents get less content
-                    max_content_length = 250   # Reduced for speed
-                
-                if len(content) > max_content_length:
-                    content = content[:max_content_length] + "..."
-                
-                context_parts.append(f"[Source {i}] {title}\n{content}\n")
-                
-                # Prepare source information
-                sources.append({
-                    'title': title,
-                    'similarity': round(doc.get('similarity', 0), 3),
-                    'url': url,
-                    'content_preview': content[:200] + "..." if len(content) > 200 else content,
-                    'rank': i
-                })
-            
-            context = "\n".join(context_parts)
-            
-            # Enhanced prompt for specific, comprehensive answers
-            prompt_template = """Answer this Northeastern University question using the provided context:
-
-Context: {context}
-Question: {question}
-
-Instructions:
-- Answer the specific question using the context above
-- Provide detailed, structured information
-- Include specific details like numbers, dates, requirements
-- Be comprehensive and helpful
-
-Answer:"""
-            
-            prompt = PromptTemplate(
-                template=prompt_template,
-                input_variables=["context", "question"]
-            )
+                return self._no_context_result()
             
             # Generate answer with optimized settings
-            formatted_prompt = prompt.format(context=context, question=question)
-            response = self.llm.invoke(formatted_prompt)
-            answer = response.content
+            formatted_prompt, sources = self._build_prompt(question, context_docs)
+            answer = self.llm.invoke(formatted_prompt).content
             
             # Validate and improve answer if needed (Railway logic) - DISABLED for speed
             # answer = self._validate_and_improve_answer(question, answer, context)
             
-            # Calculate confidence based on multiple factors like Railway code
-            if not context_docs:
-                confidence_percentage = 0.0
-            else:
-                # Factor 1: Average similarity of retrieved documents
-                avg_similarity = sum(doc.get('similarity', 0) for doc in context_docs) / len(context_docs)
-                
-                # Factor 2: Number of relevant documents
-                doc_count_score = min(len(context_docs) / 10.0, 1.0)
-                
-                # Factor 3: Answer length (comprehensive answers indicate good information)
-                answer_length_score = min(len(answer) / 500.0, 1.0)
-                
-                # Factor 4: Content diversity (different sources)
-                unique_sources = len(set(doc.get('source_url', '') for doc in context_docs))
-                source_diversity_score = min(unique_sources / 5.0, 1.0)
-                
-                # Weighted combination
-                overall_confidence = (
-                    avg_similarity * 0.4 +
-                    doc_count_score * 0.2 +
-                    answer_length_score * 0.2 +
-                    source_diversity_score * 0.2
-                )
-                
-                # Convert to percentage
-                confidence_percentage = max(0, min(100, overall_confidence * 100))
-            
-            if confidence_percentage > 70:
-                confidence = 'high'
-            elif confidence_percentage > 50:
-                confidence = 'medium'
-            else:
-                confidence = 'low'
+            return self._score_answer(answer, sources, context_docs)
             
+        except Exception as e:
+            logger.error(f"[LAMBDA GPU] Error generating answer: {e}")
             return {
-                'answer': answer,
-                'sources': sources,
-                'confidence': confidence,
-                'confidence_percentage': confidence_percentage,
-                'documents_searched': len(context_docs)
+                'answer': f"I encountered an error generating the answer: {str(e)}",
+                'sources': [],
+                'confidence': 'low'
             }
+    
+    async def agenerate_answer(self, question: str, context_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """generate_answer that awaits the LLM instead of blocking a thread on it"""
+        try:
+            if not context_docs:
+                return self._no_context_result()
+            
+            formatted_prompt, sources = self._build_prompt(question, context_docs)
+            answer = (await self.llm.ainvoke(formatted_prompt)).content
+            return self._score_answer(answer, sources, context_docs)
             
         except Exception as e:
             logger.error(f"[LAMBDA GPU] Error generating answer: {e}")
@@ -762,31 +1368,40 @@ Answer:"""
                 'confidence': 'low'
             }
     
-    def chat(self, question: str) -> ChatResponse:
-        """Main chat function with comprehensive timing"""
-        start_time = time.time()
+    def _retrieve(self, question: str) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]], List[Dict[str, Any]], float]:
+        """Answer-cache lookup, then document search on a miss: (query embedding, cached result, documents, search time)"""
+        # Concurrent requests meet in the micro-batcher; the embedding is cached, so
+        # search_documents below reuses it for free
+        query_embedding = self.embedding_manager.get_query_embedding(question)
         
-        logger.info(f"[LAMBDA GPU] Processing question: {question[:100]}...")
+        # No _retrieval_lock here: the query and answer caches lock themselves, so concurrent
+        # requests overlap their Chroma round-trips (or FAISS searches) instead of queueing
+        result = self.answer_cache.lookup(question, query_embedding) if self.answer_cache is not None else None
+        if result is not None:
+            logger.info("[LAMBDA GPU] Answer cache hit, skipping search and generation")
+            return query_embedding, result, [], 0.0
         
         # Search for relevant documents with optimized coverage
         search_start = time.time()
         documents = self.search_documents(question, n_results=5)  # Use 5 documents for speed
-        search_time = time.time() - search_start
-        
-        # Generate answer
-        generation_start = time.time()
-        result = self.generate_answer(question, documents)
-        generation_time = time.time() - generation_start
+        return query_embedding, None, documents, time.time() - search_start
+    
+    def _respond(self, question: str, query_embedding, result: Dict[str, Any], fresh: bool,
+                 start_time: float, search_time: float, generation_time: float) -> ChatResponse:
+        """Cache a fresh answer and wrap the result with timing and GPU info"""
+        # Only grounded answers are worth replaying
+        if fresh and self.answer_cache is not None and query_embedding is not None and result['sources']:
+            self.answer_cache.add(question, query_embedding, result)
         
         total_time = time.time() - start_time
             
-        logger.info(f"[LAMBDA GPU] Total response time: {total_time:.2f}s (search: {search_time:.2f}s, generation: {generation_time:.2f}s)")
+        logger.info("[LAMBDA GPU] Total response time: %.2fs (search: %.2fs, generation: %.2fs)", total_time, search_time, generation_time)
         
-        # Add timing information
+        # Add timing information (raw seconds; the API rounds them when serializing)
         timing = {
-            'search': round(search_time, 2),
-            'generation': round(generation_time, 2),
-            'total': round(total_time, 2)
+            'search': search_time,
+            'generation': generation_time,
+            'total': total_time
         }
         
         # Get GPU info
@@ -801,16 +1416,167 @@ Answer:"""
             gpu_info=gpu_info
         )
     
+    def chat(self, question: str) -> ChatResponse:
+        """Main chat function with comprehensive timing"""
+        start_time = time.time()
+        
+        logger.info("[LAMBDA GPU] Processing question: %.100s...", question)
+        
+        query_embedding, result, documents, search_time = self._retrieve(question)
+        
+        generation_time = 0.0
+        fresh = result is None
+        if fresh:
+            # Generate answer
+            generation_start = time.time()
+            result = self.generate_answer(question, documents)
+            generation_time = time.time() - generation_start
+        
+        return self._respond(question, query_embedding, result, fresh, start_time, search_time, generation_time)
+    
+    async def achat(self, question: str) -> ChatResponse:
+        """Async chat: retrieval runs in a worker thread and generation awaits the LLM, so one
+        request's search overlaps other requests' LLM round-trips instead of blocking the event loop"""
+        start_time = time.time()
+        
+        logger.info("[LAMBDA GPU] Processing question: %.100s...", question)
+        
+        query_embedding, result, documents, search_time = await asyncio.to_thread(self._retrieve, question)
+        
+        generation_time = 0.0
+        fresh = result is None
+        if fresh:
+            generation_start = time.time()
+            result = await self.agenerate_answer(question, documents)
+            generation_time = time.time() - generation_start
+        
+        response = self._respond(question, query_embedding, result, fresh, start_time, search_time, generation_time)
+        self._schedule_prewarm(question)
+        return response
+    
+    def _followup_queries(self, question: str) -> List[str]:
+        """Templated follow-ups about the question's topic"""
+        topic = question.strip().rstrip('?.! ')
+        lowered = topic.lower()
+        for prefix in self.FOLLOWUP_STRIP_PREFIXES:
+            if lowered.startswith(prefix):
+                topic = topic[len(prefix):]
+                break
+        return [template.format(topic=topic) for template in self.FOLLOWUP_TEMPLATES] if topic else []
+    
+    async def _prewarm(self, question: str):
+        """Embed likely follow-ups into the query cache so asking one skips the encoder"""
+        queries = self._followup_queries(question)
+        if not queries:
+            return
+        
+        def embed():
+            with self._retrieval_lock:
+                self.embedding_manager.get_query_embeddings(queries)
+        
+        try:
+            await asyncio.to_thread(embed)
+        except Exception as e:
+            logger.warning(f"[LAMBDA GPU] Follow-up prewarm failed: {e}")
+    
+    def _schedule_prewarm(self, question: str):
+        """Start a prewarm task unless disabled or prewarm_max_tasks are already running"""
+        if not self.prewarm_enabled or len(self._prewarm_tasks) >= self.prewarm_max_tasks:
+            return
+        task = asyncio.create_task(self._prewarm(question))
+        self._prewarm_tasks.add(task)  # keep a reference until it finishes
+        task.add_done_callback(self._prewarm_tasks.discard)
+    
+    async def chat_stream(self, question: str) -> AsyncIterator[ChatResponse]:
+        """Streaming achat: partial responses carry only the newly generated text in answer,
+        the last one is the complete answer with confidence and timing (incl. first_token)"""
+        start_time = time.time()
+        
+        logger.info("[LAMBDA GPU] Processing streamed question: %.100s...", question)
+        
+        query_embedding, result, documents, search_time = await asyncio.to_thread(self._retrieve, question)
+        if result is not None or not documents:
+            if result is None:
+                result = self._no_context_result()
+            yield self._respond(question, query_embedding, result, False, start_time, search_time, 0.0)
+            return
+        
+        formatted_prompt, sources = self._build_prompt(question, documents)
+        generation_start = time.time()
+        first_token_time = None
+        parts = []
+        try:
+            async for chunk in self.llm.astream(formatted_prompt):
+                if not chunk.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - generation_start
+                parts.append(chunk.content)
+                yield ChatResponse(
+                    answer=chunk.content,
+                    sources=sources,
+                    confidence='pending',
+                    confidence_percentage=0,
+                    timing={'first_token': first_token_time},
+                    gpu_info={}
+                )
+            result = self._score_answer("".join(parts), sources, documents)
+            fresh = True
+        except Exception as e:
+            logger.error(f"[LAMBDA GPU] Error streaming answer: {e}")
+            result = {
+                'answer': f"I encountered an error generating the answer: {str(e)}",
+                'sources': [],
+                'confidence': 'low'
+            }
+            fresh = False
+        
+        response = self._respond(question, query_embedding, result, fresh, start_time, search_time, time.time() - generation_start)
+        response.timing['first_token'] = first_token_time or 0.0
+        self._schedule_prewarm(question)
+        yield response
+    
+    async def chat_batch(self, questions: List[str]) -> List[ChatResponse]:
+        """Answer several questions together: one embedding forward pass for all of them,
+        then retrieval per question and every LLM call in flight at once"""
+        start_time = time.time()
+        
+        logger.info("[LAMBDA GPU] Processing batch of %d questions", len(questions))
+        
+        def embed_all():
+            with self._retrieval_lock:
+                self.embedding_manager.get_query_embeddings(questions)
+        
+        # Warms the query-embedding cache, so each _retrieve below finds its vector already computed
+        await asyncio.to_thread(embed_all)
+        retrieved = await asyncio.gather(*[asyncio.to_thread(self._retrieve, question) for question in questions])
+        
+        async def answer(question, retrieval):
+            query_embedding, result, documents, search_time = retrieval
+            generation_time = 0.0
+            fresh = result is None
+            if fresh:
+                generation_start = time.time()
+                result = await self.agenerate_answer(question, documents)
+                generation_time = time.time() - generation_start
+            return self._respond(question, query_embedding, result, fresh, start_time, search_time, generation_time)
+        
+        return list(await asyncio.gather(*[answer(question, retrieval) for question, retrieval in zip(questions, retrieved)]))
+    
     def clear_cache(self):
-        """Clear GPU cache and embeddings cache"""
+        """Clear embeddings, answer and prompt-fragment caches"""
         try:
-            # Clear GPU cache
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-            
-            # Clear embeddings cache
-            self.embedding_manager.embeddings_cache = {}
-            self.embedding_manager.document_embeddings = {}
+            # The CUDA caching allocator is left alone: emptying it here only forces fresh cudaMallocs
+            # on the next request. Returning memory to the driver is clear_gpu_cache()'s job.
+            
+            # Clear embeddings cache; wait out any bulk encode still writing the stores
+            with self._retrieval_lock:
+                with self.embedding_manager._query_cache_lock:
+                    self.embedding_manager.embeddings_cache.clear()
+                self.embedding_manager.clear_document_embeddings()
+                if self.answer_cache is not None:
+                    self.answer_cache.clear()
+                self._doc_fragments.clear()
             
             logger.info("[LAMBDA GPU] Cache cleared successfully")
             return True
@@ -821,20 +1587,24 @@ Answer:"""
 
 # Global chatbot instance for Lambda Labs
 chatbot_instance = None
+_chatbot_lock = threading.Lock()
 
 def get_chatbot() -> LambdaGPUUniversityRAGChatbot:
-    """Get or create chatbot instance"""
+    """Get or create chatbot instance (concurrent first calls build exactly one)"""
     global chatbot_instance
     
     if chatbot_instance is None:
-        logger.info("[LAMBDA GPU] Creating new chatbot instance...")
-        chatbot_instance = LambdaGPUUniversityRAGChatbot()
+        with _chatbot_lock:
+            if chatbot_instance is None:
+                logger.info("[LAMBDA GPU] Creating new chatbot instance...")
+                chatbot_instance = LambdaGPUUniversityRAGChatbot()
     
     return chatbot_instance
 
 def clear_gpu_cache():
-    """Clear GPU cache for memory management"""
-    if torch.cuda.is_available():
+    """Release cached GPU blocks back to the driver (explicit only; never on the request path)"""
+    # An RMM pool keeps its memory by design; there is no torch cache to release
+    if torch.cuda.is_available() and not RMM_ALLOCATOR_ACTIVE:
         torch.cuda.empty_cache()
         logger.info("[LAMBDA GPU] GPU cache cleared")
 
@@ -8,6 +8,7 @@ import time
 import pickle
 import hashlib
 import logging
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional, Union
 from dataclasses import dataclass
 import asyncio
@@ -33,7 +34,8 @@ class LambdaGPUCacheManager:
     
     def __init__(self, cache_dir: str = "lambda_gpu_cache"):
         self.cache_dir = cache_dir
-        self.memory_cache = {}
+        self.memory_cache = OrderedDict()  # Least recently used first
+        self._memory_bytes = 0  # Running sum of memory_cache sizes
         self.disk_cache = {}
         self.cache_stats = {
             'hits': 0,
@@ -96,6 +98,13 @@ class LambdaGPUCacheManager:
         except:
             return 1024  # Default estimate
     
+    def _pop_memory_entry(self, cache_key: str) -> Optional[CacheEntry]:
+        """Remove an entry from the memory cache, keeping the byte count in step"""
+        entry = self.memory_cache.pop(cache_key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size_bytes
+        return entry
+    
     def _cleanup_expired_entries(self):
         """Clean up expired cache entries"""
         try:
@@ -109,8 +118,7 @@ class LambdaGPUCacheManager:
             
             # Remove expired entries
             for key in expired_keys:
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
+                if self._pop_memory_entry(key) is not None:
                     self.cache_stats['evictions'] += 1
             
             # Check disk cache
@@ -133,29 +141,18 @@ class LambdaGPUCacheManager:
     def _evict_lru_entries(self, required_size: int):
         """Evict least recently used entries to make space"""
         try:
-            # Sort by access count and timestamp
-            sorted_entries = sorted(
-                self.memory_cache.items(),
-                key=lambda x: (x[1].access_count, x[1].timestamp)
-            )
-            
             freed_size = 0
-            evicted_keys = []
+            evicted = 0
             
-            for key, entry in sorted_entries:
-                if freed_size >= required_size:
-                    break
-                
+            # memory_cache is kept in recency order, so victims come off the front
+            while freed_size < required_size and self.memory_cache:
+                _, entry = self.memory_cache.popitem(last=False)
+                self._memory_bytes -= entry.size_bytes
                 freed_size += entry.size_bytes
-                evicted_keys.append(key)
+                evicted += 1
             
-            # Remove evicted entries
-            for key in evicted_keys:
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                    self.cache_stats['evictions'] += 1
-            
-            logger.info(f"[LAMBDA CACHE] Evicted {len(evicted_keys)} entries, freed {freed_size} bytes")
+            self.cache_stats['evictions'] += evicted
+            logger.info(f"[LAMBDA CACHE] Evicted {evicted} entries, freed {freed_size} bytes")
             
         except Exception as e:
             logger.error(f"[LAMBDA CACHE] Error in LRU eviction: {e}")
@@ -172,11 +169,12 @@ class LambdaGPUCacheManager:
                 
                 # Check if expired
                 if current_time - entry.timestamp > entry.ttl:
-                    del self.memory_cache[cache_key]
+                    self._pop_memory_entry(cache_key)
                     self.cache_stats['misses'] += 1
                     return None
                 
-                # Update access count and return
+                # Mark as most recently used, update access count and return
+                self.memory_cache.move_to_end(cache_key)
                 entry.access_count += 1
                 self.cache_stats['hits'] += 1
                 return entry.data
@@ -201,6 +199,7 @@ class LambdaGPUCacheManager:
                         # Move to memory cache if small enough
                         if entry.size_bytes < 1024 * 1024:  # 1MB threshold
                             self.memory_cache[cache_key] = entry
+                            self._memory_bytes += entry.size_bytes
                             if cache_key in self.disk_cache:
                                 del self.disk_cache[cache_key]
                         
@@ -241,15 +240,17 @@ class LambdaGPUCacheManager:
             use_memory = force_memory or size_bytes < 1024 * 1024  # 1MB threshold
             
             if use_memory:
-                # Check memory cache size
-                current_memory_size = sum(entry.size_bytes for entry in self.memory_cache.values())
+                # A replaced entry gives its bytes back and is re-inserted as most recent
+                self._pop_memory_entry(cache_key)
                 
-                if current_memory_size + size_bytes > self.max_memory_cache_size:
+                # Check memory cache size
+                if self._memory_bytes + size_bytes > self.max_memory_cache_size:
                     # Evict LRU entries
                     self._evict_lru_entries(size_bytes)
                 
                 # Store in memory cache
                 self.memory_cache[cache_key] = entry
+                self._memory_bytes += size_bytes
                 logger.debug(f"[LAMBDA CACHE] Stored in memory cache: {cache_key}")
                 
             else:
@@ -282,8 +283,7 @@ class LambdaGPUCacheManager:
             deleted = False
             
             # Remove from memory cache
-            if cache_key in self.memory_cache:
-                del self.memory_cache[cache_key]
+            if self._pop_memory_entry(cache_key) is not None:
                 deleted = True
             
             # Remove from disk cache
@@ -311,7 +311,7 @@ class LambdaGPUCacheManager:
                         keys_to_remove.append(key)
                 
                 for key in keys_to_remove:
-                    del self.memory_cache[key]
+                    self._pop_memory_entry(key)
                 
                 # Clear disk files
                 for key in keys_to_remove:
@@ -323,6 +323,7 @@ class LambdaGPUCacheManager:
             else:
                 # Clear all caches
                 self.memory_cache.clear()
+                self._memory_bytes = 0
                 self.disk_cache.clear()
                 
                 # Remove all disk files
@@ -349,7 +350,7 @@ class LambdaGPUCacheManager:
             # Calculate memory usage
             memory_entries = len(self.memory_cache)
             disk_entries = len(self.disk_cache)
-            memory_size = sum(entry.size_bytes for entry in self.memory_cache.values())
+            memory_size = self._memory_bytes
             
             # Count expired entries
             expired_memory = sum(1 for entry in self.memory_cache.values() 